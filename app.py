@@ -1,9 +1,16 @@
 import streamlit as st
 import time
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, time as dt_time
-import pandas as pd
+from typing import NamedTuple
+import numpy as np
 import gspread
+from google.auth.transport.requests import AuthorizedSession
 from google.oauth2.service_account import Credentials
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Configuration de la page
 st.set_page_config(
@@ -11,7 +18,63 @@ st.set_page_config(
     layout="wide"
 )
 
+# Styles définis une fois : le compteur n'envoie ensuite que son texte,
+# les cartes de comparaison un seul bloc HTML
+st.markdown(
+    """
+    <style>
+    .st-key-compteur_actif [data-testid="stText"],
+    .st-key-compteur_pause [data-testid="stText"] {
+        text-align: center;
+        font-family: inherit;
+        font-size: 4em;
+        font-weight: 700;
+    }
+    .st-key-compteur_actif [data-testid="stText"] { color: #00d26a; }
+    .st-key-compteur_pause [data-testid="stText"] { color: #666; }
+    .comparaisons {
+        display: grid;
+        grid-template-columns: repeat(auto-fit, minmax(12rem, 1fr));
+        gap: 1rem;
+    }
+    .comparaisons .carte {
+        padding: 1rem;
+        border-radius: 0.5rem;
+        background-color: rgba(28, 131, 225, 0.1);
+        color: inherit;
+    }
+    </style>
+    """,
+    unsafe_allow_html=True
+)
+
 # Configuration Google Sheets
+@st.cache_resource
+def get_log_config():
+    """Lit une seule fois les secrets Google Sheets ; (None, None) s'ils sont absents"""
+    try:
+        return (
+            st.secrets["google_sheet"]["sheet_id"],
+            dict(st.secrets["gcp_service_account"])
+        )
+    except (KeyError, FileNotFoundError) as e:
+        # Seuls les secrets absents désactivent les logs ; toute autre erreur remonte
+        logging.getLogger(__name__).warning(
+            "Secrets Google Sheets absents, logs désactivés : %r", e
+        )
+        return None, None
+
+SHEET_ID, GCP_CREDS_INFO = get_log_config()
+
+# Nouvelles tentatives HTTP : les POST (values.append, batchUpdate) ne sont
+# réessayés que sur 429, jamais appliqué côté serveur ; une erreur 5xx ou de
+# lecture peut survenir après l'ajout des lignes et créerait des doublons
+class RetrySansDoublons(Retry):
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method.upper() == "POST":
+            return status_code == 429
+        return super().is_retry(method, status_code, has_retry_after)
+
 @st.cache_resource
 def get_google_sheets_connection():
     """Crée et met en cache la connexion Google Sheets"""
@@ -22,50 +85,144 @@ def get_google_sheets_connection():
         ]
         
         credentials = Credentials.from_service_account_info(
-            st.secrets["gcp_service_account"],
+            GCP_CREDS_INFO,
             scopes=scopes
         )
         
-        client = gspread.authorize(credentials)
+        # Session HTTP partagée : connexions TLS réutilisées d'un envoi à l'autre,
+        # nouvelles tentatives avec backoff sur 429 et erreurs serveur.
+        # Les appels se font dans le thread d'envoi des logs : attendre jusqu'à
+        # ~30 s (aucune attente avant le 1er nouvel essai, puis 1, 2, 4, 8 et
+        # 16 s, ou Retry-After) laisse le quota par minute de l'API Sheets se
+        # libérer sans bloquer l'interface.
+        session = AuthorizedSession(credentials)
+        session.mount("https://", HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=4,
+            max_retries=RetrySansDoublons(
+                total=6,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                raise_on_status=False  # laisser gspread lever son APIError
+            )
+        ))
+        
+        client = gspread.Client(auth=credentials, session=session)
         return client
     except Exception as e:
         st.error(f"Erreur de connexion Google Sheets: {e}")
         return None
 
+@st.cache_resource
+def get_logs_worksheet(sheet_id):
+    """Ouvre et met en cache l'onglet "Logs" (créé s'il n'existe pas)"""
+    client = get_google_sheets_connection()
+    if client is None:
+        # Lever plutôt que retourner None, pour ne pas mettre l'échec en cache
+        raise RuntimeError("connexion Google Sheets indisponible")
+    
+    spreadsheet = client.open_by_key(sheet_id)
+    try:
+        return spreadsheet.worksheet("Logs")
+    except gspread.WorksheetNotFound:
+        worksheet = spreadsheet.add_worksheet(title="Logs", rows="1000", cols="4")
+        # Ajouter les en-têtes
+        worksheet.append_rows(
+            [["Timestamp", "Salaire Brut", "Statut", "User Info"]],
+            value_input_option="RAW",
+            table_range="A1"
+        )
+        return worksheet
+
 def log_to_google_sheet(salaire_brut, statut, timestamp):
-    """Envoie les données vers Google Sheet"""
+    """Met en file d'attente une ligne de log (envoyée par flush_logs)"""
+    if SHEET_ID is None:
+        return False
+    
+    st.session_state.pending_log_rows.append([
+        timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+        salaire_brut,
+        statut,
+        "User"
+    ])
+    return True
+
+@st.cache_resource
+def get_log_executor():
+    """Crée le thread unique d'envoi des logs en arrière-plan"""
+    return ThreadPoolExecutor(max_workers=1)
+
+def append_log_rows(sheet_id, rows):
+    """Ajoute les lignes à "Logs" en un seul appel ; retourne (lignes, erreur) en cas d'échec"""
     try:
-        client = get_google_sheets_connection()
-        if client is None:
-            return False
-        
-        sheet_id = st.secrets["google_sheet"]["sheet_id"]
-        
-        # Ouvrir le spreadsheet
-        spreadsheet = client.open_by_key(sheet_id)
-        
-        # Ouvrir l'onglet "Logs" (créer s'il n'existe pas)
-        try:
-            worksheet = spreadsheet.worksheet("Logs")
-        except gspread.WorksheetNotFound:
-            worksheet = spreadsheet.add_worksheet(title="Logs", rows="1000", cols="4")
-            # Ajouter les en-têtes
-            worksheet.append_row(["Timestamp", "Salaire Brut", "Statut", "User Info"])
-        
-        # Ajouter la ligne de données
-        row_data = [
-            timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-            salaire_brut,
-            statut,
-            "User"
-        ]
-        
-        worksheet.append_row(row_data)
-        return True
-        
+        get_logs_worksheet(sheet_id).append_rows(
+            rows,
+            value_input_option="RAW",
+            insert_data_option="INSERT_ROWS",
+            table_range="A1"
+        )
     except Exception as e:
-        st.error(f"Erreur lors de l'envoi des logs: {e}")
+        # L'onglet a pu être supprimé ou renommé : le rouvrir au prochain envoi
+        get_logs_worksheet.clear()
+        # Rendre les lignes à la session qui a demandé l'envoi : elle les
+        # renverra elle-même, en respectant son backoff
+        return rows, e
+    return None
+
+def logs_en_attente(salaire_brut):
+    """Indique si une saisie ou des lignes de log attendent encore d'être envoyées"""
+    saisie_en_attente = (
+        not st.session_state.log_sent
+        and salaire_brut > 0
+        and SHEET_ID is not None
+    )
+    return (
+        saisie_en_attente
+        or bool(st.session_state.pending_log_rows)
+        or st.session_state.log_envoi is not None
+    )
+
+def flush_logs():
+    """Transmet en un seul lot les lignes en attente au thread d'envoi"""
+    # Résultat de l'envoi précédent
+    if st.session_state.log_envoi is not None:
+        future = st.session_state.log_envoi
+        if not future.done():
+            return False
+        st.session_state.log_envoi = None
+        echec = future.result()
+        if echec is not None:
+            rows_non_envoyees, erreur = echec
+            # Remettre les lignes en tête de la file de la session
+            st.session_state.pending_log_rows[:0] = rows_non_envoyees
+            # Suspendre les envois (backoff exponentiel avec gigue, 60 s max)
+            st.session_state.log_failures += 1
+            st.session_state.log_next_try = time.time() + min(
+                60, 2 ** st.session_state.log_failures + random.random()
+            )
+            # Conservée pour rester affichée jusqu'au prochain envoi réussi
+            st.session_state.log_erreur = f"Erreur lors de l'envoi des logs: {erreur}"
+        else:
+            st.session_state.log_failures = 0
+            st.session_state.log_erreur = None
+    
+    rows = st.session_state.pending_log_rows
+    # Au plus un envoi toutes les 5 secondes, et pas pendant une suspension
+    if not rows or time.time() - st.session_state.last_flush <= 5:
+        return False
+    if time.time() < st.session_state.log_next_try:
         return False
+    
+    # Chaque envoi ne porte que les lignes de cette session : en cas d'échec,
+    # elles lui reviennent et aucune autre session ne croit l'envoi réussi
+    st.session_state.log_envoi = get_log_executor().submit(
+        append_log_rows,
+        SHEET_ID,
+        rows
+    )
+    st.session_state.pending_log_rows = []
+    st.session_state.last_flush = time.time()
+    return True
 
 # Initialisation de session_state
 if 'running' not in st.session_state:
@@ -73,48 +230,132 @@ if 'running' not in st.session_state:
 if 'total_earned_today' not in st.session_state:
     st.session_state.total_earned_today = 0.0
 if 'last_update' not in st.session_state:
-    st.session_state.last_update = time.time()
-if 'last_logged_salary' not in st.session_state:
-    st.session_state.last_logged_salary = None
+    st.session_state.last_update = time.monotonic()
+if 'last_logged_key' not in st.session_state:
+    st.session_state.last_logged_key = None
 if 'log_sent' not in st.session_state:
     st.session_state.log_sent = False
+if 'pending_since' not in st.session_state:
+    st.session_state.pending_since = 0.0
 if 'start_time' not in st.session_state:
     st.session_state.start_time = None
+if 'pending_log_rows' not in st.session_state:
+    st.session_state.pending_log_rows = []
+if 'last_flush' not in st.session_state:
+    st.session_state.last_flush = 0.0
+if 'log_envoi' not in st.session_state:
+    st.session_state.log_envoi = None
+if 'log_failures' not in st.session_state:
+    st.session_state.log_failures = 0
+if 'log_next_try' not in st.session_state:
+    st.session_state.log_next_try = 0.0
+if 'log_erreur' not in st.session_state:
+    st.session_state.log_erreur = None
+if 'inputs_hash' not in st.session_state:
+    st.session_state.inputs_hash = None
+if 'compteur_actif' not in st.session_state:
+    st.session_state.compteur_actif = False
+
+# Part du brut conservée après charges sociales, selon le statut
+COEF_NET_AVANT_IMPOT = {
+    "Cadre": 1 - 0.25,  # ~25% de charges sociales
+    "Non-cadre": 1 - 0.23,  # ~23% pour non-cadre
+    "Fonction publique": 1 - 0.23
+}
 
 # Fonction de calcul du salaire net
 def calculate_net_salary(brut_annuel, statut):
     """Calcule le salaire net avant impôt"""
-    if statut == "Cadre":
-        taux_charges = 0.25  # ~25% de charges sociales
-    else:
-        taux_charges = 0.23  # ~23% pour non-cadre
-    
-    net_avant_impot = brut_annuel * (1 - taux_charges)
-    return net_avant_impot
+    return brut_annuel * COEF_NET_AVANT_IMPOT[statut]
+
+# Barème 2024 : bornes et taux de chaque tranche
+TRANCHES_MIN = np.array([0, 11294, 28797, 82341, 177106], dtype=np.float64)
+TRANCHES_MAX = np.array([11294, 28797, 82341, 177106, np.inf])
+TRANCHES_TAUX = np.array([0, 0.11, 0.30, 0.41, 0.45])
+TRANCHES_LARGEUR = TRANCHES_MAX - TRANCHES_MIN
 
 # Fonction de calcul de l'impôt
+@st.cache_data(max_entries=128)
 def calculate_impot(net_avant_impot, parts_fiscales, autres_revenus):
     """Calcule l'impôt sur le revenu selon le barème progressif 2024"""
     revenu_imposable = (net_avant_impot + autres_revenus) / parts_fiscales
     
-    # Barème 2024
-    tranches = [
-        (0, 11294, 0),
-        (11294, 28797, 0.11),
-        (28797, 82341, 0.30),
-        (82341, 177106, 0.41),
-        (177106, float('inf'), 0.45)
-    ]
-    
-    impot = 0
-    for i, (min_tranche, max_tranche, taux) in enumerate(tranches):
-        if revenu_imposable > min_tranche:
-            base = min(revenu_imposable, max_tranche) - min_tranche
-            impot += base * taux
-    
-    impot_total = impot * parts_fiscales
+    # Part du revenu dans chaque tranche, puis somme pondérée par les taux
+    bases = np.clip(revenu_imposable - TRANCHES_MIN, 0, TRANCHES_LARGEUR)
+    impot = bases @ TRANCHES_TAUX
+    
+    impot_total = float(impot) * parts_fiscales
     return impot_total
 
+# Grandeurs dérivées des paramètres de la sidebar
+class Revenus(NamedTuple):
+    """Montants annuels et revenus nets après impôt par période"""
+    net_avant_impot: float
+    impot_annuel: float
+    deductions_annuelles: float
+    net_apres_impot_annuel: float
+    revenu_par_seconde: float
+    revenu_par_minute: float
+    revenu_par_heure: float
+    revenu_par_jour: float
+    revenu_mensuel: float
+
+@st.cache_data(max_entries=64)
+def compute_derived(salaire_brut, statut, mode_impot, taux_ou_parts, autres_revenus,
+                    heures_semaine, semaines_travaillees, mutuelle, retraite_supp,
+                    part_salariale_transport, autres_deductions):
+    """Calcule le net, l'impôt et les revenus par période (mis en cache)"""
+    net_avant_impot = calculate_net_salary(salaire_brut, statut)
+    
+    if mode_impot == "Taux de prélèvement":
+        impot_annuel = net_avant_impot * taux_ou_parts
+    else:
+        impot_annuel = calculate_impot(net_avant_impot, taux_ou_parts, autres_revenus)
+    
+    deductions_annuelles = (mutuelle + retraite_supp + part_salariale_transport + autres_deductions) * 12
+    net_apres_impot_annuel = net_avant_impot - impot_annuel - deductions_annuelles
+    
+    # Calcul des revenus par période
+    heures_travaillees_annuel = heures_semaine * semaines_travaillees
+    secondes_travaillees_annuel = heures_travaillees_annuel * 3600
+    
+    revenu_par_seconde = net_apres_impot_annuel / secondes_travaillees_annuel
+    revenu_par_minute = revenu_par_seconde * 60
+    revenu_par_heure = revenu_par_minute * 60
+    revenu_par_jour = revenu_par_heure * (heures_semaine / 5)  # Supposant 5 jours/semaine
+    revenu_mensuel = net_apres_impot_annuel / 12
+    
+    return Revenus(
+        net_avant_impot=net_avant_impot,
+        impot_annuel=impot_annuel,
+        deductions_annuelles=deductions_annuelles,
+        net_apres_impot_annuel=net_apres_impot_annuel,
+        revenu_par_seconde=revenu_par_seconde,
+        revenu_par_minute=revenu_par_minute,
+        revenu_par_heure=revenu_par_heure,
+        revenu_par_jour=revenu_par_jour,
+        revenu_mensuel=revenu_mensuel
+    )
+
+# Heure actuelle en secondes depuis minuit (comparée aux bornes de travail)
+# Décalage du fuseau local par rapport à UTC, relu à chaque exécution du script
+DECALAGE_UTC = time.localtime().tm_gmtoff
+
+def secondes_depuis_minuit():
+    """Retourne l'heure locale actuelle en secondes depuis minuit"""
+    return int(time.time() + DECALAGE_UTC) % 86400
+
+# Tableau Markdown (évite la conversion DataFrame + Arrow de st.dataframe)
+def markdown_table(colonnes, lignes):
+    """Construit un tableau Markdown à partir des colonnes et des lignes (tuples)"""
+    return "\n".join(
+        [
+            "| " + " | ".join(colonnes) + " |",
+            "|" + "---|" + "---:|" * (len(colonnes) - 1)
+        ]
+        + ["| " + " | ".join(ligne) + " |" for ligne in lignes]
+    )
+
 # Interface utilisateur
 st.title("💰 Visualisation des revenus en temps réel")
 
@@ -130,20 +371,27 @@ with st.sidebar:
         help="Votre salaire brut annuel en euros"
     )
     
-    # Détection du changement et envoi au Google Sheet
-    if salaire_brut_annuel != st.session_state.last_logged_salary and salaire_brut_annuel > 0:
-        st.session_state.last_logged_salary = salaire_brut_annuel
-        st.session_state.log_sent = False
-    
     statut = st.selectbox(
         "Statut",
         ["Cadre", "Non-cadre", "Fonction publique"],
         help="Votre statut professionnel"
     )
     
-    # Envoi des logs si non déjà envoyé
-    if not st.session_state.log_sent and salaire_brut_annuel > 0:
-        with st.spinner("📝 Enregistrement..."):
+    # Détection du changement (salaire ou statut) et envoi au Google Sheet
+    log_key = (salaire_brut_annuel, statut)
+    if log_key != st.session_state.last_logged_key and salaire_brut_annuel > 0:
+        st.session_state.last_logged_key = log_key
+        st.session_state.log_sent = False
+        st.session_state.pending_since = time.monotonic()
+    
+    # Envoi des logs, revérifié toutes les 0,5 s tant que quelque chose est en attente
+    verification_logs = 0.5 if logs_en_attente(salaire_brut_annuel) else None
+    
+    @st.fragment(run_every=verification_logs)
+    def envoyer_logs(salaire_brut_annuel, statut):
+        """Met en file la saisie une fois stable depuis 2 s, puis envoie les logs"""
+        salaire_stable = time.monotonic() - st.session_state.pending_since > 2.0
+        if not st.session_state.log_sent and salaire_brut_annuel > 0 and salaire_stable:
             success = log_to_google_sheet(
                 salaire_brut_annuel,
                 statut,
@@ -151,9 +399,20 @@ with st.sidebar:
             )
             if success:
                 st.session_state.log_sent = True
-                st.success("✅ Données enregistrées", icon="✅")
-                time.sleep(1)
-                st.rerun()
+                st.toast("Enregistrement en cours…", icon="📝")
+        
+        # Envoi groupé des logs en attente
+        flush_logs()
+        if st.session_state.log_erreur:
+            st.error(st.session_state.log_erreur)
+        
+        # Plus rien en attente : relancer l'application pour arrêter la vérification
+        if verification_logs and not logs_en_attente(salaire_brut_annuel):
+            st.rerun()
+    
+    envoyer_logs(salaire_brut_annuel, statut)
+    if SHEET_ID is None:
+        st.caption("Logs désactivés : secrets Google Sheets non configurés")
     
     # Section Fiscalité
     st.subheader("📊 Fiscalité")
@@ -210,6 +469,10 @@ with st.sidebar:
             value=dt_time(18, 0)
         )
     
+    # Bornes de travail en secondes depuis minuit, pour le compteur
+    st.session_state.debut_s = heure_debut.hour * 3600 + heure_debut.minute * 60
+    st.session_state.fin_s = heure_fin.hour * 3600 + heure_fin.minute * 60
+    
     # Déductions supplémentaires
     st.subheader("💳 Déductions Supplémentaires")
     mutuelle = st.number_input(
@@ -262,132 +525,156 @@ with st.sidebar:
         unsafe_allow_html=True
     )
 
-# Calculs
-net_avant_impot = calculate_net_salary(salaire_brut_annuel, statut)
-
+# Calculs (recalculés seulement quand un paramètre de la sidebar change)
 if mode_impot == "Taux de prélèvement":
-    impot_annuel = net_avant_impot * taux_prelevement
+    taux_ou_parts, autres_revenus = taux_prelevement, 0
 else:
-    impot_annuel = calculate_impot(net_avant_impot, parts_fiscales, autres_revenus)
+    taux_ou_parts = parts_fiscales
 
-deductions_annuelles = (mutuelle + retraite_supp + part_salariale_transport + autres_deductions) * 12
-net_apres_impot_annuel = net_avant_impot - impot_annuel - deductions_annuelles
+parametres = (
+    salaire_brut_annuel,
+    statut,
+    mode_impot,
+    taux_ou_parts,
+    autres_revenus,
+    heures_semaine,
+    semaines_travaillees,
+    mutuelle,
+    retraite_supp,
+    part_salariale_transport,
+    autres_deductions
+)
+inputs_hash = hash(parametres)
+if inputs_hash != st.session_state.inputs_hash:
+    st.session_state.revenus = compute_derived(*parametres)
+    st.session_state.inputs_hash = inputs_hash
 
-# Calcul des revenus par période
-heures_travaillees_annuel = heures_semaine * semaines_travaillees
-secondes_travaillees_annuel = heures_travaillees_annuel * 3600
+revenus = st.session_state.revenus
 
-revenu_par_seconde = net_apres_impot_annuel / secondes_travaillees_annuel
-revenu_par_minute = revenu_par_seconde * 60
-revenu_par_heure = revenu_par_minute * 60
-revenu_par_jour = revenu_par_heure * (heures_semaine / 5)  # Supposant 5 jours/semaine
-revenu_mensuel = net_apres_impot_annuel / 12
+# Seul scalaire lu par le compteur à chaque tick
+st.session_state.revenu_par_seconde = revenus.revenu_par_seconde
 
 # Vérification des heures de travail
-now = datetime.now().time()
-is_work_hours = heure_debut <= now <= heure_fin
+is_work_hours = st.session_state.debut_s <= secondes_depuis_minuit() <= st.session_state.fin_s
 
 # Affichage des métriques principales
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    st.metric("Salaire Net Annuel", f"{net_apres_impot_annuel:,.2f} €")
+    st.metric("Salaire Net Annuel", f"{revenus.net_apres_impot_annuel:,.2f} €")
 with col2:
-    st.metric("Revenu Mensuel", f"{revenu_mensuel:,.2f} €")
+    st.metric("Revenu Mensuel", f"{revenus.revenu_mensuel:,.2f} €")
 with col3:
-    st.metric("Par Heure", f"{revenu_par_heure:.2f} €")
+    st.metric("Par Heure", f"{revenus.revenu_par_heure:.2f} €")
 with col4:
-    st.metric("Par Seconde", f"{revenu_par_seconde:.4f} €")
+    st.metric("Par Seconde", f"{revenus.revenu_par_seconde:.4f} €")
 
 # Séparateur
 st.divider()
 
-# Zone du compteur en temps réel
-col1, col2 = st.columns([2, 1])
+# Zone du compteur en temps réel, seule réexécutée (10 fois/s) pendant le décompte
+# (pas de rafraîchissement si le compteur ne peut pas avancer : revenu nul ou négatif)
+compteur_actif = st.session_state.running and is_work_hours and revenus.revenu_par_seconde > 0
+rafraichissement = 0.1 if compteur_actif else None
 
-with col1:
-    st.subheader("Compteur en temps réel")
-    
-    if not is_work_hours:
-        st.warning(f"⏸️ Vous n'êtes pas dans vos heures de travail ({heure_debut.strftime('%H:%M')} - {heure_fin.strftime('%H:%M')})")
-    
-    # Contrôles
-    col_btn1, col_btn2, col_btn3 = st.columns(3)
-    
-    with col_btn1:
-        if st.button("▶️ Démarrer" if not st.session_state.running else "⏸️ Pause", use_container_width=True):
-            st.session_state.running = not st.session_state.running
-            st.session_state.last_update = time.time()
-    
-    with col_btn2:
-        if st.button("❌ Reset journalier", use_container_width=True):
-            st.session_state.total_earned_today = 0.0
-            st.session_state.start_time = None
-            st.session_state.last_update = time.time()
-    
-    with col_btn3:
-        if st.button("🕐 Selon l'heure actuelle", use_container_width=True):
-            # Calculer le temps écoulé depuis le début de la journée
-            now = datetime.now()
-            current_time = now.time()
-            
-            if heure_debut <= current_time <= heure_fin:
-                # Calculer les secondes depuis heure_debut
-                debut_seconds = heure_debut.hour * 3600 + heure_debut.minute * 60 + heure_debut.second
-                current_seconds = current_time.hour * 3600 + current_time.minute * 60 + current_time.second
-                elapsed_seconds = current_seconds - debut_seconds
-                
-                # Calculer le revenu accumulé
-                st.session_state.total_earned_today = elapsed_seconds * revenu_par_seconde
-                st.session_state.start_time = now
-                st.session_state.last_update = time.time()
-                st.success(f"✅ Actualisé à {current_time.strftime('%H:%M:%S')}")
-            else:
-                st.warning("⚠️ Vous n'êtes pas dans vos heures de travail")
-            
-            time.sleep(1)
-            st.rerun()
+# Reprise du décompte (revenu redevenu positif, début des heures de travail) :
+# repartir de maintenant plutôt que de compter le temps passé à l'arrêt
+if compteur_actif and not st.session_state.compteur_actif:
+    st.session_state.last_update = time.monotonic()
+st.session_state.compteur_actif = compteur_actif
+
+@st.fragment(run_every=rafraichissement)
+def afficher_compteur(revenu_par_jour, heure_debut, heure_fin):
+    """Affiche le compteur et les statistiques du jour"""
+    revenu_par_seconde = st.session_state.revenu_par_seconde
+    now_s = secondes_depuis_minuit()
+    is_work_hours = st.session_state.debut_s <= now_s <= st.session_state.fin_s
     
-    # Compteur
-    counter_placeholder = st.empty()
+    # Fin des heures de travail : relancer l'application pour arrêter les ticks
+    if rafraichissement and not is_work_hours:
+        st.rerun()
     
-    if st.session_state.running and is_work_hours:
-        current_time = time.time()
-        elapsed = current_time - st.session_state.last_update
-        st.session_state.total_earned_today += elapsed * revenu_par_seconde
-        st.session_state.last_update = current_time
+    col1, col2 = st.columns([2, 1])
+
+    with col1:
+        st.subheader("Compteur en temps réel")
         
-        counter_placeholder.markdown(
-            f"<h1 style='text-align: center; color: #00d26a; font-size: 4em;'>{st.session_state.total_earned_today:.2f} €</h1>",
-            unsafe_allow_html=True
-        )
-        time.sleep(0.1)
-        st.rerun()
-    else:
-        counter_placeholder.markdown(
-            f"<h1 style='text-align: center; color: #666; font-size: 4em;'>{st.session_state.total_earned_today:.2f} €</h1>",
-            unsafe_allow_html=True
-        )
+        if not is_work_hours:
+            st.warning(f"⏸️ Vous n'êtes pas dans vos heures de travail ({heure_debut.strftime('%H:%M')} - {heure_fin.strftime('%H:%M')})")
+        
+        # Contrôles
+        col_btn1, col_btn2, col_btn3 = st.columns(3)
+        
+        with col_btn1:
+            if st.button("▶️ Démarrer" if not st.session_state.running else "⏸️ Pause", use_container_width=True):
+                st.session_state.running = not st.session_state.running
+                st.session_state.last_update = time.monotonic()
+                # Relancer toute l'application pour (dés)activer le rafraîchissement
+                st.rerun()
+        
+        with col_btn2:
+            if st.button("❌ Reset journalier", use_container_width=True):
+                st.session_state.total_earned_today = 0.0
+                st.session_state.start_time = None
+                st.session_state.last_update = time.monotonic()
+        
+        with col_btn3:
+            if st.button("🕐 Selon l'heure actuelle", use_container_width=True):
+                # Calculer le temps écoulé depuis le début de la journée
+                now = datetime.now()
+                
+                if is_work_hours:
+                    # Calculer les secondes depuis heure_debut
+                    elapsed_seconds = now_s - st.session_state.debut_s
+                    
+                    # Calculer le revenu accumulé
+                    st.session_state.total_earned_today = elapsed_seconds * revenu_par_seconde
+                    st.session_state.start_time = now
+                    st.session_state.last_update = time.monotonic()
+                    st.success(f"✅ Actualisé à {now.strftime('%H:%M:%S')}")
+                else:
+                    st.warning("⚠️ Vous n'êtes pas dans vos heures de travail")
+                
+                time.sleep(1)
+                st.rerun()
+        
+        # Compteur
+        counter_placeholder = st.empty()
+        
+        if st.session_state.running and is_work_hours and revenu_par_seconde > 0:
+            current_time = time.monotonic()
+            # Borné à 0 par sécurité (reprise après mise en veille, etc.)
+            elapsed = max(0.0, current_time - st.session_state.last_update)
+            st.session_state.total_earned_today += elapsed * revenu_par_seconde
+            st.session_state.last_update = current_time
+            style_compteur = "compteur_actif"
+        else:
+            style_compteur = "compteur_pause"
+        
+        with counter_placeholder.container(key=style_compteur):
+            st.text(f"{st.session_state.total_earned_today:.2f} €")
 
-with col2:
-    st.subheader("Statistiques du jour")
-    temps_ecoule = st.session_state.total_earned_today / revenu_par_seconde if revenu_par_seconde > 0 else 0
-    heures = int(temps_ecoule // 3600)
-    minutes = int((temps_ecoule % 3600) // 60)
-    secondes = int(temps_ecoule % 60)
-    
-    st.metric("Temps travaillé", f"{heures}h {minutes}m {secondes}s")
-    st.metric("Objectif journalier", f"{revenu_par_jour:.2f} €")
-    
-    if revenu_par_jour > 0:
-        progression = (st.session_state.total_earned_today / revenu_par_jour) * 100
-        progression_clamped = min(progression / 100, 1.0)
-        st.progress(progression_clamped)
-        st.caption(f"Progression: {progression:.1f}%")
+    with col2:
+        st.subheader("Statistiques du jour")
+        temps_ecoule = st.session_state.total_earned_today / revenu_par_seconde if revenu_par_seconde > 0 else 0
+        heures = int(temps_ecoule // 3600)
+        minutes = int((temps_ecoule % 3600) // 60)
+        secondes = int(temps_ecoule % 60)
+        
+        st.metric("Temps travaillé", f"{heures}h {minutes}m {secondes}s")
+        st.metric("Objectif journalier", f"{revenu_par_jour:.2f} €")
         
-        # Afficher si l'objectif est atteint
-        if progression >= 100:
-            st.success("🎉 Objectif journalier atteint !")
+        if revenu_par_jour > 0:
+            progression = (st.session_state.total_earned_today / revenu_par_jour) * 100
+            progression_clamped = min(progression / 100, 1.0)
+            st.progress(progression_clamped)
+            st.caption(f"Progression: {progression:.1f}%")
+            
+            # Afficher si l'objectif est atteint
+            if progression >= 100:
+                st.success("🎉 Objectif journalier atteint !")
+
+afficher_compteur(revenus.revenu_par_jour, heure_debut, heure_fin)
 
 # Séparateur
 st.divider()
@@ -395,66 +682,55 @@ st.divider()
 # Section comparaisons amusantes
 st.subheader("Comparaisons")
 
-col1, col2, col3, col4 = st.columns(4)
-
-with col1:
-    cafe = revenu_par_minute * 5
-    st.info(f"☕ **Pendant un café (5 min)**\n\n{cafe:.2f} €")
-
-with col2:
-    dejeuner = revenu_par_minute * 45
-    st.info(f"🍽️ **Pendant le déjeuner (45 min)**\n\n{dejeuner:.2f} €")
-
-with col3:
-    reunion = revenu_par_heure
-    st.info(f"👥 **Pendant une réunion (1h)**\n\n{reunion:.2f} €")
+libelles_comparaisons = [
+    "☕ Pendant un café (5 min)",
+    "🍽️ Pendant le déjeuner (45 min)",
+    "👥 Pendant une réunion (1h)",
+    "📅 Par semaine (5 jours)"
+]
+# Durées en minutes, converties en montants en une seule multiplication
+durees_minutes = np.array([5, 45, 60, 60 * heures_semaine])
+montants_comparaisons = durees_minutes * revenus.revenu_par_minute
 
-with col4:
-    semaine = revenu_par_jour * 5
-    st.info(f"📅 **Par semaine (5 jours)**\n\n{semaine:.2f} €")
+# Les quatre cartes forment un seul élément (un seul delta par exécution)
+cartes = "".join(
+    f"<div class='carte'><b>{libelle}</b><br><br>{montant:.2f} €</div>"
+    for libelle, montant in zip(libelles_comparaisons, montants_comparaisons)
+)
+st.html(f"<div class='comparaisons'>{cartes}</div>")
 
 # Détails des calculs
 with st.expander("📊 Détails des Calculs"):
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.markdown("### Décomposition du salaire")
-        charges_sociales = salaire_brut_annuel - net_avant_impot
+    # Contenu construit seulement à la demande : l'état ouvert/fermé de
+    # l'expander n'est pas connu côté serveur
+    if st.toggle("Afficher le détail", key="show_details"):
+        col1, col2 = st.columns(2)
         
-        data = {
-            "Poste": [
-                "Salaire brut",
-                "Charges sociales",
-                "Net avant impôt",
-                "Impôt sur le revenu",
-                "Déductions supplémentaires",
-                "Net après impôt"
-            ],
-            "Montant (€)": [
-                f"{salaire_brut_annuel:,.2f}",
-                f"-{charges_sociales:,.2f}",
-                f"{net_avant_impot:,.2f}",
-                f"-{impot_annuel:,.2f}",
-                f"-{deductions_annuelles:,.2f}",
-                f"{net_apres_impot_annuel:,.2f}"
+        with col1:
+            st.markdown("### Décomposition du salaire")
+            charges_sociales = salaire_brut_annuel - revenus.net_avant_impot
+            
+            lignes = [
+                ("Salaire brut", f"{salaire_brut_annuel:,.2f}"),
+                ("Charges sociales", f"-{charges_sociales:,.2f}"),
+                ("Net avant impôt", f"{revenus.net_avant_impot:,.2f}"),
+                ("Impôt sur le revenu", f"-{revenus.impot_annuel:,.2f}"),
+                ("Déductions supplémentaires", f"-{revenus.deductions_annuelles:,.2f}"),
+                ("Net après impôt", f"{revenus.net_apres_impot_annuel:,.2f}")
             ]
-        }
-        st.dataframe(data, hide_index=True, use_container_width=True)
-    
-    with col2:
-        st.markdown("### Répartition temporelle")
-        data_temps = {
-            "Période": ["Par seconde", "Par minute", "Par heure", "Par jour", "Par mois", "Par an"],
-            "Revenu (€)": [
-                f"{revenu_par_seconde:.4f}",
-                f"{revenu_par_minute:.2f}",
-                f"{revenu_par_heure:.2f}",
-                f"{revenu_par_jour:.2f}",
-                f"{revenu_mensuel:.2f}",
-                f"{net_apres_impot_annuel:,.2f}"
+            st.markdown(markdown_table(("Poste", "Montant (€)"), lignes))
+        
+        with col2:
+            st.markdown("### Répartition temporelle")
+            lignes_temps = [
+                ("Par seconde", f"{revenus.revenu_par_seconde:.4f}"),
+                ("Par minute", f"{revenus.revenu_par_minute:.2f}"),
+                ("Par heure", f"{revenus.revenu_par_heure:.2f}"),
+                ("Par jour", f"{revenus.revenu_par_jour:.2f}"),
+                ("Par mois", f"{revenus.revenu_mensuel:.2f}"),
+                ("Par an", f"{revenus.net_apres_impot_annuel:,.2f}")
             ]
-        }
-        st.dataframe(data_temps, hide_index=True, use_container_width=True)
+            st.markdown(markdown_table(("Période", "Revenu (€)"), lignes_temps))
 
 # Footer
 st.divider()